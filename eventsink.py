@@ -0,0 +1,117 @@
+import io
+import sys
+import json
+import datetime
+from collections import Counter, defaultdict
+
+# buffered JSON Lines event sink, replaces per-track print/logging calls
+# on the hot path - records are written in batches, low-value events are
+# sampled and everything is tallied for the end of run summary
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+
+class EventSink:
+
+    def __init__(self,
+                 filename=None,
+                 level='info',
+                 batch_size=500,
+                 sample_first=10,
+                 sample_every=100,
+                 tally_limit=1000,
+                 tally_top=25,
+                 console=None):
+
+        self.filename = filename
+        self.level = LEVELS[level]
+        self.batch_size = batch_size
+        self.sample_first = sample_first
+        self.sample_every = sample_every
+        self.tally_limit = tally_limit
+        self.tally_top = tally_top
+        self.console = console
+        self.counters = Counter()
+        self.suppressed = Counter()
+        self.tallies = defaultdict(Counter)
+        self.__buffer = list()
+
+    def enabled(self, level):
+        return LEVELS[level] >= self.level
+
+    def emit(self, event, level='debug', key=None, sample=False, **fields):
+        # key is the aggregation bucket, defaults to the event name
+        key = key or event
+        self.counters[key] += 1
+        # errors always get through whatever the verbosity
+        if 'error' != level and not self.enabled(level):
+            return
+        if LEVELS[level] < LEVELS['warning']:
+            # low-value events, keep the first few then sample
+            seen = self.counters[key]
+            if sample and seen > self.sample_first and seen % self.sample_every:
+                self.suppressed[key] += 1
+                return
+        record = self.__record(level, event, fields)
+        if LEVELS[level] >= LEVELS['warning']:
+            # errors are never buffered away from the operator
+            self.__echo(record)
+        self.__buffer.append(record)
+        if len(self.__buffer) >= self.batch_size:
+            self.flush()
+
+    def error(self, event, **fields):
+        self.emit(event, level='error', **fields)
+
+    def tally(self, bucket, value):
+        # per-value counts, capped so a long-lived sink stays bounded
+        counts = self.tallies[bucket]
+        if value in counts or len(counts) < self.tally_limit:
+            counts[value] += 1
+        else:
+            counts['<other>'] += 1
+
+    def flush(self):
+        if not self.__buffer:
+            return
+        if self.filename:
+            text = ''.join(self.__format(record) for record in self.__buffer)
+            with io.open(self.filename, 'a', encoding='UTF-8') as f:
+                f.write(text)
+        self.__buffer = list()
+
+    def close(self, **totals):
+        # one summary record per run whatever the verbosity, counters
+        # include the sampled out events
+        record = self.__record('info', 'summary', totals)
+        record.update(counters=dict(self.counters),
+                      suppressed=dict(self.suppressed),
+                      tallies={bucket: dict(counts.most_common(self.tally_top))
+                               for bucket, counts in self.tallies.items()})
+        self.__echo(record)
+        self.__buffer.append(record)
+        self.flush()
+
+    def __echo(self, record):
+        # console=None follows sys.stderr as it is now, so redirection by an
+        # embedding process is honoured, console=False silences it
+        if self.console is False:
+            return
+        console = self.console or sys.stderr
+        console.write(self.__format(record))
+
+    def __format(self, record):
+        return json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+    def __record(self, level, event, fields):
+        record = dict(ts=datetime.datetime.now().isoformat(timespec='seconds'),
+                      level=level,
+                      event=event)
+        record.update(fields)
+        return record
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
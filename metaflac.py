@@ -1,7 +1,9 @@
 import io
+import os
 import struct
 import codecs
 from collections import defaultdict
+from functools import reduce
 
 # https://xiph.org/flac/format.html#metadata_block
 # All numbers used in a FLAC bitstream are integers; 
@@ -23,7 +25,7 @@ def _read(file, nbytes):  # helper function to check if we haven't reached EOF
 
 class MetaFlac:
 
-    def __init__(self, filename, genres=None):
+    def __init__(self, filename, genres=None, sink=None):
         self.__block_streaminfo = None
         self.__block_application = None
         self.__block_seektable = None
@@ -34,6 +36,7 @@ class MetaFlac:
 
         self.genres = genres
         self.filename = filename
+        self.sink = sink
 
         with io.open(filename, 'rb') as file:
 
@@ -65,8 +68,7 @@ class MetaFlac:
                     self.__block_picture = file.read(size)
 
                 elif block_type < 127:
-                    print(block_type)
-                    raise NotImplementedError('reserved')
+                    raise NotImplementedError(f'reserved block type {block_type}')
 
                 else:
                     raise NotImplementedError('invalid, to avoid confusion with a frame sync code')
@@ -180,13 +182,39 @@ class MetaFlac:
         picture['data'] = block[20:20+length] # (n*8bites) The binary picture data.
         return picture
 
+    def get_vorbis_comment_block(self):
+        # raw VORBIS_COMMENT payload as read from the file
+        return self.__block_vorbis_comment
+
+    def build_vorbis_comment_block(self, text):
+        # serialize "KEY=value" lines the way metaflac --import-tags-from
+        # would write them, the vendor string is preserved on import
+        block = self.__block_vorbis_comment or b''
+        vendor = b''
+        if block:
+            vendorLength = struct.unpack('I', block[0:4])[0]
+            vendor = block[4:4+vendorLength]
+        # metaflac splits the import on '\n' only, splitlines() would also
+        # break on \x0b, \x85, \u2028 etc and never compare equal
+        comments = [codecs.encode(line, 'UTF-8') for line in text.split('\n') if line]
+        out = struct.pack('I', len(vendor)) + vendor
+        out += struct.pack('I', len(comments))
+        for comment in comments:
+            out += struct.pack('I', len(comment)) + comment
+        return out
+
     def __sanitize_genre(self, tags):
         if self.genres:
             try:
                 ret = self.genres[tags]
                 return ret, (ret != tags)
             except KeyError:
-                print('>>{}<<'.format(tags))
+                if self.sink:
+                    self.sink.emit('genre_miss',
+                                   sample=True,
+                                   genre=tags,
+                                   file=self.filename)
+                    self.sink.tally('genre_miss', tags)
                 return tags, False
         else:
             return tags, False
@@ -223,7 +251,11 @@ class MetaFlac:
                     value, test = self.__sanitize_genre(value)
                     # if genre transposed/cleansed then flag
                     if test:
-                        print(value)
+                        if self.sink:
+                            self.sink.emit('genre_fix',
+                                           sample=True,
+                                           genre=value,
+                                           file=self.filename)
                         expanded = True
 
                 # support multiple entries for genre, artist etc
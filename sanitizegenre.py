@@ -3,15 +3,37 @@
 import os
 import sys
 import argparse
-import logging
 import subprocess
 import datetime
+import tempfile
 import glob
 from pathlib import Path
 from metaflac import MetaFlac
+from eventsink import EventSink, LEVELS
 import csv
 import re
+import shlex
+import traceback
 import contextlib
+from collections import namedtuple, Counter
+
+
+REPLAY_GAIN = '+8.500000 dB'
+
+# rules are compiled once at import and shared by every session
+SPLIT_SLASH = re.compile(r'^(.*)/(.*)$')
+SPLIT_COLON = re.compile(r'^(.*):(.*)$')
+SPLIT_UNDERSCORE = re.compile(r'^(.*)_(.*)$')
+SPLIT_DASH = re.compile(r'^(.*)-(.*)$')
+CATALOG_NUMBER = re.compile(r'\[([^\[]*)\][^\[]*$')
+FOLDER_TAIL = re.compile(r'([^/]+?)$')
+ALPHABETIZED = re.compile(r'^(.*), (Das|Der|Die|El|La|Las|Le|Les|Los|The)$',
+                          re.IGNORECASE)
+
+# outcome of a single fix_flac_tags call, skipped is set when a metaflac
+# rewrite was avoided - the rules fired but the resulting VORBIS_COMMENT is
+# byte-identical to the file's, or only an ID3 header had to be stripped
+FixResult = namedtuple('FixResult', 'filename changed rewritten skipped error')
 
 
 @contextlib.contextmanager
@@ -24,25 +46,25 @@ def ignored(*exceptions):
 
 def run_command(cmd, exc=0):
 
-    logging.debug(cmd)
+    # failures are reported by the caller against the file
     if 1 == exc:
         try:
             rc = subprocess.run(cmd, shell=True)
             if 0 == rc.returncode:
                 return True
-        except subprocess.CalledProcessError as err:
-            logger.warning(err.output)
+        except subprocess.CalledProcessError:
             return False
     return False
 
 
 def fix_flac_tags(filename,
                   genres=None,
-                  replay_gain='+8.500000 dB',
+                  replay_gain=REPLAY_GAIN,
                   isvarious=False,
                   discnumber=0,
                   disctotal=0,
-                  tracktotal=0):
+                  tracktotal=0,
+                  sink=None):
 
     changed = False
     vinyl_rip = '24bVR'
@@ -52,18 +74,28 @@ def fix_flac_tags(filename,
     today = datetime.date.today()
     metflac = None
 
-    try:
-        metaflac = MetaFlac(filename, genres)
-    except:
-        logging.error(f'Exception on {filename}')
-        return
+    if sink is None:
+        sink = EventSink()
 
-    # for each album processed we should be able to "cache"
-    # the genre and use rather than reworking over and over
-    flac_comment, changed, ID3_tags = metaflac.get_sanitized_vorbis_comment()
+    def rule(message):
+        # rule hits are low value individually, aggregate per rule
+        sink.emit('rule',
+                  key=f'rule {message}',
+                  sample=True,
+                  rule=message,
+                  file=filename)
 
-    if ID3_tags:
-        changed = True
+    try:
+        metaflac = MetaFlac(filename, genres, sink)
+        # for each album processed we should be able to "cache"
+        # the genre and use rather than reworking over and over
+        flac_comment, changed, ID3_tags = metaflac.get_sanitized_vorbis_comment()
+    except Exception as err:
+        sink.error('exception',
+                   file=filename,
+                   error=repr(err),
+                   trace=traceback.format_exc())
+        return FixResult(filename, False, False, False, err)
 
     if 0 == isvarious:
         with ignored(KeyError, IndexError):
@@ -74,7 +106,7 @@ def fix_flac_tags(filename,
     for idx, artist in enumerate(flac_comment['ARTIST']):
         if 'none'==artist.lower():
             flac_comment['ARTIST'].remove('None')
-            logging.debug('Cleanup ARTIST Tag')
+            rule('Cleanup ARTIST Tag')
             changed = True
 
     for test_tag in ('ALBUMARTIST', 'ALBUM ARTIST'):
@@ -82,7 +114,7 @@ def fix_flac_tags(filename,
             if 'Various' in flac_comment[test_tag][0] or 1 == isvarious:
                 if 'Various Production' not in flac_comment[test_tag][0]:
                     flac_comment.pop(test_tag, None)
-                    logging.debug(f'Delete {test_tag} Tag')
+                    rule(f'Delete {test_tag} Tag')
                     changed = True
 
     try:
@@ -91,15 +123,14 @@ def fix_flac_tags(filename,
             if 'ARTIST' not in flac_comment:
                 regex = None
                 if '/' in flac_comment['TITLE'][0]:
-                    regex = r'^(.*)/(.*)$'
+                    regex = SPLIT_SLASH
                 elif ':' in flac_comment['TITLE'][0]:
-                    regex = r'^(.*):(.*)$'
+                    regex = SPLIT_COLON
                 elif '_' in flac_comment['TITLE'][0]:
-                    regex = r'^(.*)_(.*)$'
+                    regex = SPLIT_UNDERSCORE
                 elif '-' in flac_comment['TITLE'][0]:
-                    regex = r'^(.*)-(.*)$'
+                    regex = SPLIT_DASH
                 if regex:
-                    print(f"Fix artist and title {flac_comment['TITLE'][0]}")
                     unpack = re.split(regex,
                                       flac_comment['TITLE'][0],
                                       maxsplit=2)
@@ -113,19 +144,18 @@ def fix_flac_tags(filename,
                         title = unpack[2].strip()
                     flac_comment['ARTIST'].append(artist)
                     flac_comment['TITLE'][0] = title
-                    logging.debug('Adding ARTIST Tag')
+                    rule('Adding ARTIST Tag')
                     changed = True
 
             elif 'arious' in flac_comment['ARTIST'][0]:
                 regex = None
                 if '/' in flac_comment['TITLE'][0]:
-                    regex = r'^(.*)/(.*)$'
+                    regex = SPLIT_SLASH
                 elif '_' in flac_comment['TITLE'][0]:
-                    regex = r'^(.*)_(.*)$'
+                    regex = SPLIT_UNDERSCORE
                 elif '-' in flac_comment['TITLE'][0]:
-                    regex = r'^(.*)-(.*)$'
+                    regex = SPLIT_DASH
                 if regex:
-                    print(f"Fix artist and title {flac_comment['TITLE'][0]}")
                     unpack = re.split(regex,
                                       flac_comment['TITLE'][0],
                                       maxsplit=2)
@@ -139,7 +169,7 @@ def fix_flac_tags(filename,
                         title = unpack[2].strip()
                     flac_comment['ARTIST'][0] = artist
                     flac_comment['TITLE'][0] = title
-                    logging.debug('Fixing ARTIST and TITLE Tag')
+                    rule('Fixing ARTIST and TITLE Tag')
                     changed = True
             elif flac_comment['ARTIST'][0] in flac_comment['TITLE'][0]:
                 regex = None
@@ -152,44 +182,47 @@ def fix_flac_tags(filename,
                 elif '-' in flac_comment['TITLE'][0]:
                     regex = f'{artist}.*-(.*)$'
                 if regex:
-                    print(f"Fix title {flac_comment['TITLE'][0]}")
                     unpack = re.split(regex,
                                       flac_comment['TITLE'][0],
                                       maxsplit=2)
                     flac_comment['TITLE'][0] = unpack[1].strip()
-                    logging.debug('Fixing TITLE Tag')
+                    rule('Fixing TITLE Tag')
                     changed = True
 
-    except Exception:
-        pass
+    except Exception as err:
+        # routine for tracks lacking ARTIST/TITLE or a usable separator
+        sink.emit('artist_title_skipped',
+                  sample=True,
+                  file=filename,
+                  error=repr(err))
 
     if 'ARTIST' in flac_comment:
         if 'None' in flac_comment['ARTIST']:
             flac_comment['ARTIST'].remove('None')
-            logging.debug(f'Cleanup discogstagger cruft')
+            rule(f'Cleanup discogstagger cruft')
             changed = True
 
     if 'PERFORMER' not in flac_comment:
         if 'ARTIST' in flac_comment:
             flac_comment['PERFORMER'].append(flac_comment['ARTIST'][0])
-            logging.debug('Adding PERFORMER Tag')
+            rule('Adding PERFORMER Tag')
             changed = True
     elif "" == flac_comment['PERFORMER'][0].strip() or "Various Artists" == flac_comment['PERFORMER'][0].strip():
         if 'ARTIST' in flac_comment:
             flac_comment.pop('PERFORMER', None)
             flac_comment['PERFORMER'].append(flac_comment['ARTIST'][0])
-            logging.debug('Adding PERFORMER Tag')
+            rule('Adding PERFORMER Tag')
             changed = True
 
     if 'CATALOGNUMBER' not in flac_comment:
         if '[' in flac_comment['ALBUM'][0]:
-            regex = r'\[([^\[]*)\][^\[]*$'
+            regex = CATALOG_NUMBER
             unpack = re.split(regex,
                               flac_comment['ALBUM'][0],
                               maxsplit=1)
             if unpack:
                 flac_comment['CATALOGNUMBER'].append(unpack[1].strip())
-                logging.debug('Adding CATALOGNUMBER Tag')
+                rule('Adding CATALOGNUMBER Tag')
                 changed = True
 
     # fix disktotal, disknumber tag typo
@@ -202,8 +235,8 @@ def fix_flac_tags(filename,
                 with ignored(KeyError, ValueError):
                     value = str(int(flac_comment[test_tag][0])).zfill(2)
                 flac_comment[new_tag].append(value)
-                logging.debug(f'Adding {new_tag} Tag')
-            logging.debug(f'Cleanup {test_tag} Tag')
+                rule(f'Adding {new_tag} Tag')
+            rule(f'Cleanup {test_tag} Tag')
             flac_comment.pop(test_tag, None)
             changed = True
 
@@ -218,19 +251,17 @@ def fix_flac_tags(filename,
                     value = tracktotal
                 if value > 0:
                     flac_comment[test_tag].append(value)
-                    logging.debug(f'Adding {test_tag} Tag')
+                    rule(f'Adding {test_tag} Tag')
                     changed = True
 
     # fix alphabetized stoopids
-    regex = r'^(.*), (Das|Der|Die|El|La|Las|Le|Les|Los|The)$'
-
     for test_tag in ('ARTIST', 'ALBUMARTIST', 'ALBUM ARTIST'):
         if test_tag in flac_comment:
             for i, value in enumerate(flac_comment[test_tag]):
-                m = re.search(regex, value, re.IGNORECASE)
+                m = ALPHABETIZED.search(value)
                 if m:
                     flac_comment[test_tag][i] = f'{m.group(2).capitalize()} {m.group(1)}'
-                    logging.debug(f'Fixing {test_tag} Tag')
+                    rule(f'Fixing {test_tag} Tag')
                     changed = True
 
     if 'REPLAYGAIN_TRACK_GAIN' in flac_comment:
@@ -239,12 +270,12 @@ def fix_flac_tags(filename,
                                                         '+3.5',
                                                         '+3.50'):
             flac_comment['REPLAYGAIN_TRACK_GAIN'][0] = replay_gain
-            logging.debug('Fix REPLAYGAIN_TRACK_GAIN Tag')
+            rule('Fix REPLAYGAIN_TRACK_GAIN Tag')
             changed = True
         elif '0' == flac_comment['REPLAYGAIN_TRACK_GAIN'][0]:
             flac_comment.pop('REPLAYGAIN_TRACK_GAIN', None)
             flac_comment['REPLAYGAIN_TRACK_GAIN'].append(replay_gain)
-            logging.debug('Fix REPLAYGAIN_TRACK_GAIN Tag')
+            rule('Fix REPLAYGAIN_TRACK_GAIN Tag')
             changed = True
 
     with ignored(KeyError, IndexError):
@@ -252,58 +283,56 @@ def fix_flac_tags(filename,
             if fixem in flac_comment:
                 if bad_vinyl_tag in flac_comment[fixem][0]:
                     flac_comment[fixem][0] = flac_comment[fixem][0].replace(bad_vinyl_tag,vinyl_rip)
-                    logging.debug(f'Fix {fixem} typo.')
+                    rule(f'Fix {fixem} typo.')
                     changed = True
                 if folder_sig in flac_comment[fixem][0]:
-                    regex = r'([^/]+?)$'
-                    print(f'{flac_comment[fixem][0]}')
+                    regex = FOLDER_TAIL
                     unpack = re.split(regex,
                               flac_comment[fixem][0],
                               maxsplit=1)
-                    print(f'0:{unpack[0]} or 1:{unpack[1]}')
                     if unpack:
                         flac_comment[fixem][0] = unpack[1].strip()
-                        logging.debug(f'Fix {fixem} typo.')
+                        rule(f'Fix {fixem} typo.')
                         changed = True
 
     with ignored(KeyError, IndexError):
         if 'fzz' in flac_comment['COMMENTS'][0] or 'FZZ' in flac_comment['COMMENTS'][0]:
-            logging.debug('Default COMMENT Tag')
+            rule('Default COMMENT Tag')
             flac_comment.pop('COMMENTS', None)
             changed = True
         if 'ffz' in flac_comment['COMMENTS'][0] or 'FFZ' in flac_comment['COMMENTS'][0]:
-            logging.debug('Default COMMENT Tag')
+            rule('Default COMMENT Tag')
             flac_comment.pop('COMMENTS', None)
             changed = True
         if 'fzz' in flac_comment['COMMENT'][0] or 'FZZ' in flac_comment['COMMENT'][0]:
-            logging.debug('Default COMMENT Tag')
+            rule('Default COMMENT Tag')
             flac_comment.pop('COMMENT', None)
             changed = True
         if 'ffz' in flac_comment['COMMENT'][0] or 'FFZ' in flac_comment['COMMENT'][0]:
-            logging.debug('Default COMMENT Tag')
+            rule('Default COMMENT Tag')
             flac_comment.pop('COMMENT', None)
             changed = True
         if 'NAD' in flac_comment['COMMENT'][0]:
             if 'REPLAYGAIN_TRACK_GAIN' not in flac_comment:
                 flac_comment['REPLAYGAIN_TRACK_GAIN'].append(replay_gain)
-                logging.debug('Add REPLAYGAIN_TRACK_GAIN Tag')
+                rule('Add REPLAYGAIN_TRACK_GAIN Tag')
                 changed = True
         if vinyl_rip in flac_comment['ALBUM'][0]:
             if 'REPLAYGAIN_TRACK_GAIN' not in flac_comment:
                 flac_comment['REPLAYGAIN_TRACK_GAIN'].append(replay_gain)
-                logging.debug('Add REPLAYGAIN_TRACK_GAIN Tag')
+                rule('Add REPLAYGAIN_TRACK_GAIN Tag')
                 changed = True
         if 'inyl' in flac_comment['COMMENT'][0] or 'Digitally' in flac_comment['COMMENT'][0]:
             if 'REPLAYGAIN_TRACK_GAIN' not in flac_comment:
                 flac_comment['REPLAYGAIN_TRACK_GAIN'].append(replay_gain)
-                logging.debug('Add REPLAYGAIN_TRACK_GAIN Tag')
+                rule('Add REPLAYGAIN_TRACK_GAIN Tag')
                 changed = True
             flac_comment.pop('COMMENT', None)
             changed = True
         if 'inyl' in flac_comment['COMMENTS'][0] or 'Digitally' in flac_comment['COMMENTS'][0]:
             if 'REPLAYGAIN_TRACK_GAIN' not in flac_comment:
                 flac_comment['REPLAYGAIN_TRACK_GAIN'].append(replay_gain)
-                logging.debug('Add REPLAYGAIN_TRACK_GAIN Tag')
+                rule('Add REPLAYGAIN_TRACK_GAIN Tag')
                 changed = True
             flac_comment.pop('COMMENTS', None)
             changed = True
@@ -315,7 +344,7 @@ def fix_flac_tags(filename,
         'Digitally' in flac_comment['COMMENT'][0]:
             if 'REPLAYGAIN_TRACK_GAIN' not in flac_comment:
                 flac_comment['REPLAYGAIN_TRACK_GAIN'].append(replay_gain)
-                logging.debug('Add REPLAYGAIN_TRACK_GAIN Tag')
+                rule('Add REPLAYGAIN_TRACK_GAIN Tag')
                 changed = True
             flac_comment.pop('COMMENTS', None)
             changed = True
@@ -334,20 +363,19 @@ def fix_flac_tags(filename,
                       'GROUPING'):
         if redundant in flac_comment:
             flac_comment.pop(redundant, None)
-            logging.debug(f'Delete {redundant} Tag')
+            rule(f'Delete {redundant} Tag')
             changed = True
 
     # add signature if not present
     if 'COMMENT' not in flac_comment:
         flac_comment['COMMENT'].append(f'FixFlac {today}')
-        logging.debug('Adding COMMENT Tag')
+        rule('Adding COMMENT Tag')
         changed = True
     else:
         with ignored(KeyError, IndexError):
             for junker in ('Saracon', 'PS3', 'AccurateRip', 'Tagged By', 'Beers', 'Digitally', 'Vinyl'):
                 if junker in flac_comment['COMMENT'][0]:
-                    print(f"---------------> {flac_comment['COMMENT'][0]}")
-                    logging.debug(f'Fix multi-line COMMENT Tag - {junker}')
+                    rule(f'Fix multi-line COMMENT Tag - {junker}')
                     flac_comment.pop('COMMENT', None)
                     flac_comment['COMMENT'].append(f'FixFlac {today}')
                     changed = True
@@ -357,120 +385,245 @@ def fix_flac_tags(filename,
         if fix_tag in flac_comment:
             if len(flac_comment[fix_tag]) > 1:
                 flac_comment[fix_tag] = flac_comment[fix_tag][:1]
-                logging.debug(f'Cleanup {fix_tag} Tag')
+                rule(f'Cleanup {fix_tag} Tag')
                 changed = True
 
+    rewritten = False
+    skipped = False
+    error = None
+
+    if ID3_tags:
+        cmd = f'id3v2 --delete-all {shlex.quote(filename)}'
+        sink.emit('id3_strip', level='info', file=filename)
+        if not run_command(cmd, 1):
+            sink.error('command_failed', file=filename, cmd=cmd)
+            error = RuntimeError(f'command failed: {cmd}')
+
     if changed:
-        tags_file = '%d.tag' % (os.getpid())
+        text = canonical_tags(flac_comment)
+        # rules are noisy, only pay for a metaflac rewrite when the
+        # serialized comment block would actually differ
+        block = metaflac.build_vorbis_comment_block(text)
+        if block == metaflac.get_vorbis_comment_block():
+            sink.emit('rewrite_avoided', sample=True, file=filename)
+            skipped = True
+            changed = False
+
+    if ID3_tags and not changed:
+        # only the ID3 header goes, the comment block is left alone
+        skipped = True
+
+    if changed:
+        # private tag file per rewrite, sessions may share a process
+        fd, tags_file = tempfile.mkstemp(suffix='.tag')
+        os.close(fd)
         tf = Path(tags_file)
 
-        if tf.exists():
-            tf.unlink()
+        sink.emit('rewrite', level='info', file=filename)
+        if sink.enabled('debug'):
+            sink.emit('tags', file=filename, tags=text.split('\n')[:-1])
 
-        logging.info(f'Rewrite FLAC tags on "{filename}"')
-        text = ''
-        for k, v in sorted(flac_comment.items()):
-            # dedupe
-            if len(v) > 1:
-                v = list(set(v))
-            for vv in v:
-                if (("\n" in vv)or("\r" in vv)):
-                    vv = vv.replace('\r\n', ' ')
-                    vv = vv.replace('\n', ' ')
-                    vv = vv.replace('\r', ' ')
-                if vv!='None' and vv!='Not On Label':
-                    if vv:
-                        text += f"{k}={vv}\n"
-        tf.write_text(text)
-        print(text)
-
-        if tf.exists():
-
-            if ID3_tags:
-                cmd = f'id3v2 --delete-all "{filename}"'
-                print(cmd)
-                run_command(cmd, 1)
+        try:
+            # same bytes build_vorbis_comment_block compared against
+            tf.write_text(text, encoding='UTF-8')
 
             # metaflac command line
             cmd = 'metaflac --preserve-modtime --no-utf8-convert'
             cmd += ' --remove-all-tags'
-            if '"' in filename:
-                cmd += f" --import-tags-from={tags_file} '{filename}'"
-            else:
-                cmd += f' --import-tags-from={tags_file} "{filename}"'
-            run_command(cmd, 1)
+            cmd += f' --import-tags-from={shlex.quote(tags_file)}'
+            cmd += f' {shlex.quote(filename)}'
+            rewritten = run_command(cmd, 1)
+            if not rewritten:
+                sink.error('command_failed', file=filename, cmd=cmd)
+                error = error or RuntimeError(f'command failed: {cmd}')
+        finally:
             # cleanup
             tf.unlink()
 
+    return FixResult(filename, changed, rewritten, skipped, error)
 
-def main(args):
+
+def canonical_tags(flac_comment):
+
+    text = ''
+    for k, v in sorted(flac_comment.items()):
+        # dedupe, order preserving so the output is stable
+        v = list(dict.fromkeys(str(vv) for vv in v))
+        for vv in v:
+            if (("\n" in vv)or("\r" in vv)):
+                vv = vv.replace('\r\n', ' ')
+                vv = vv.replace('\n', ' ')
+                vv = vv.replace('\r', ' ')
+            if vv!='None' and vv!='Not On Label':
+                if vv:
+                    text += f"{k}={vv}\n"
+    return text
+
+
+def load_genres(genre_file):
 
     genres = dict()
-    if args.genre:
-        with open(args.genre) as f:
+    if genre_file:
+        with open(genre_file) as f:
             for line in f:
                 if line.strip() and not line.strip().startswith('#'):
                     k, v = line.strip().split('|')
                     genres[k] = v
+    return genres
+
+
+class SanitizeSession:
+    """Reusable tag sanitizer, the genre table is loaded once per session.
+
+    Embed this rather than spawning the CLI per album, e.g.
+
+        with SanitizeSession(genre_file='genre.dat') as session:
+            results = session.process_album('/music/Artist - Album')
+    """
+
+    def __init__(self,
+                 genre_file=None,
+                 genres=None,
+                 replay_gain=REPLAY_GAIN,
+                 isvarious=False,
+                 discnumber=0,
+                 disctotal=0,
+                 tracktotal=0,
+                 sink=None):
+
+        self.genres = load_genres(genre_file) if genres is None else genres
+        self.replay_gain = replay_gain
+        self.isvarious = isvarious
+        self.discnumber = discnumber
+        self.disctotal = disctotal
+        self.tracktotal = tracktotal
+        self.counters = Counter()
+        # a caller supplied sink is the caller's to close
+        self.owns_sink = sink is None
+        self.sink = sink or EventSink()
+        self.closed = False
+
+    def process_file(self, filename, **overrides):
+        # per-call overrides for isvarious, discnumber etc
+        options = dict(replay_gain=self.replay_gain,
+                       isvarious=self.isvarious,
+                       discnumber=self.discnumber,
+                       disctotal=self.disctotal,
+                       tracktotal=self.tracktotal)
+        options.update(overrides)
+        try:
+            result = fix_flac_tags(str(filename),
+                                   genres=self.genres,
+                                   sink=self.sink,
+                                   **options)
+        except Exception as err:
+            # a rule tripping on odd tags must not abort the batch
+            self.sink.error('exception',
+                            file=str(filename),
+                            error=repr(err),
+                            trace=traceback.format_exc())
+            result = FixResult(str(filename), False, False, False, err)
+        self.counters['files'] += 1
+        self.counters['errors'] += result.error is not None
+        self.counters['changed'] += result.changed
+        self.counters['rewritten'] += result.rewritten
+        self.counters['rewrites_avoided'] += result.skipped
+        return result
+
+    def process_album(self, folder, **overrides):
+        return [self.process_file(path, **overrides)
+                for path in sorted(Path(folder).glob('*.flac'))]
+
+    def process_paths(self, paths, **overrides):
+        # files are processed as-is, folders as albums
+        results = list()
+        for path in paths:
+            if Path(path).is_dir():
+                results.extend(self.process_album(path, **overrides))
+            else:
+                results.append(self.process_file(path, **overrides))
+        return results
 
-    pathlist = Path(args.folder).glob('*/*.flac')
-    for path in sorted(pathlist):
-        fix_flac_tags(str(path),
-                      genres=genres,
-                      isvarious=args.various,
-                      discnumber=args.discnumber,
-                      disctotal=args.disctotal,
-                      tracktotal=args.tracktotal)
-
-
-log_file = '/tmp/sanitrizeflactag.log'
-parser = argparse.ArgumentParser()
-
-parser.add_argument('--folder', '-f',
-                    help='Folder to process',
-                    type=str)
-parser.add_argument('--genre', '-g',
-                    help='Genre Data',
-                    type=str)
-parser.add_argument('--various', '-v',
-                    help='Various Artists',
-                    type=bool,
-                    default=False)
-parser.add_argument('--backup', '-b',
-                    help='Backup original files',
-                    type=int,
-                    default=0)
-parser.add_argument('--discnumber', '-n',
-                    help='Disc Number',
-                    type=int,
-                    default=0)
-parser.add_argument('--disctotal', '-d',
-                    help='Disc Total',
-                    type=int,
-                    default=0)
-parser.add_argument('--tracktotal', '-t',
-                    help='Track Total',
-                    type=int,
-                    default=0)
-
-
-args = parser.parse_args()
+    def close(self):
+        # flush buffered events, our own sink also gets the run summary
+        if self.closed:
+            return
+        self.closed = True
+        if self.owns_sink:
+            self.sink.close(**self.counters)
+        else:
+            self.sink.flush()
 
-if __name__ == "__main__":
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(args):
+
+    sink = EventSink(filename=args.log, level=args.log_level)
+    session = SanitizeSession(genre_file=args.genre,
+                              isvarious=args.various,
+                              discnumber=args.discnumber,
+                              disctotal=args.disctotal,
+                              tracktotal=args.tracktotal,
+                              sink=sink)
+    try:
+        pathlist = Path(args.folder).glob('*/*.flac')
+        session.process_paths(sorted(pathlist))
+    finally:
+        session.close()
+        sink.close(**session.counters)
+
+
+log_file = '/tmp/sanitrizeflactag.jsonl'
+
+
+def build_parser():
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--folder', '-f',
+                        help='Folder to process',
+                        type=str)
+    parser.add_argument('--genre', '-g',
+                        help='Genre Data',
+                        type=str)
+    parser.add_argument('--various', '-v',
+                        help='Various Artists',
+                        type=bool,
+                        default=False)
+    parser.add_argument('--backup', '-b',
+                        help='Backup original files',
+                        type=int,
+                        default=0)
+    parser.add_argument('--discnumber', '-n',
+                        help='Disc Number',
+                        type=int,
+                        default=0)
+    parser.add_argument('--disctotal', '-d',
+                        help='Disc Total',
+                        type=int,
+                        default=0)
+    parser.add_argument('--tracktotal', '-t',
+                        help='Track Total',
+                        type=int,
+                        default=0)
+    parser.add_argument('--log', '-l',
+                        help='JSON Lines event log',
+                        type=str,
+                        default=log_file)
+    parser.add_argument('--log-level',
+                        help='Event verbosity',
+                        choices=sorted(LEVELS, key=LEVELS.get),
+                        default='info')
+    return parser
 
-    log_format = '%(asctime)s %(levelname)-8s %(message)s'
-    console = logging.StreamHandler()
-    console.setLevel(logging.INFO)
-    formatter = logging.Formatter(log_format)
-    console.setFormatter(formatter)
-    logging.basicConfig(level=logging.DEBUG,
-                        format=log_format,
-                        datefmt='%m-%d-%y %H:%M',
-                        filename=log_file,
-                        filemode='a')
 
-    logging.getLogger('').addHandler(console)
+if __name__ == "__main__":
 
-    main(args)
+    main(build_parser().parse_args())
 
-sys.exit(0)
+    sys.exit(0)
@@ -0,0 +1,89 @@
+import struct
+
+import pytest
+
+import sanitizegenre
+from sanitizegenre import SanitizeSession
+
+
+def vorbis_comment(comments, vendor='reference libFLAC 1.3.2'):
+    vendor = vendor.encode('UTF-8')
+    block = struct.pack('<I', len(vendor)) + vendor
+    block += struct.pack('<I', len(comments))
+    for comment in comments:
+        comment = comment.encode('UTF-8')
+        block += struct.pack('<I', len(comment)) + comment
+    return block
+
+
+def write_flac(path, comments, id3=False):
+    # STREAMINFO plus a last VORBIS_COMMENT block is all MetaFlac reads
+    block = vorbis_comment(comments)
+    data = b''
+    if id3:
+        data += b'ID3' + bytes([4, 0, 0]) + bytes(4)
+    data += b'fLaC'
+    data += struct.pack('>I', 34) + bytes(34)
+    data += struct.pack('>I', (1 << 31) | (4 << 24) | len(block)) + block
+    path.write_bytes(data)
+    return str(path)
+
+
+# sorted and deduped exactly as canonical_tags writes them, the
+# PERFORMER rule fires but reproduces the same value
+CANONICAL = ['ALBUM=Baz',
+             'ARTIST=Various Artists',
+             'COMMENT=x',
+             'DATE=1965',
+             'GENRE=Rock',
+             'PERFORMER=Various Artists',
+             'TITLE=Bar']
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    ran = list()
+
+    def run_command(cmd, exc=0):
+        ran.append(cmd)
+        return True
+
+    monkeypatch.setattr(sanitizegenre, 'run_command', run_command)
+    return ran
+
+
+def test_canonical_block_is_not_rewritten(tmp_path, commands):
+    filename = write_flac(tmp_path / '01.flac', CANONICAL)
+    session = SanitizeSession(genres={})
+    result = session.process_file(filename)
+    assert result.skipped
+    assert not result.rewritten
+    assert commands == []
+    assert session.counters['rewrites_avoided'] == 1
+
+
+def test_changed_block_is_rewritten(tmp_path, commands):
+    filename = write_flac(tmp_path / '01.flac', CANONICAL + ['GROUPING=x'])
+    result = SanitizeSession(genres={}).process_file(filename)
+    assert result.rewritten
+    assert not result.skipped
+    assert len(commands) == 1 and commands[0].startswith('metaflac')
+
+
+@pytest.mark.parametrize('separator', ['\x85', '\u2028', '\x0c'])
+def test_line_separators_in_values_compare_equal(tmp_path, commands, separator):
+    comments = CANONICAL[:-1] + [f'TITLE=Bar{separator}Baz']
+    filename = write_flac(tmp_path / '01.flac', comments)
+    result = SanitizeSession(genres={}).process_file(filename)
+    assert result.skipped
+    assert commands == []
+
+
+def test_id3_only_strips_id3(tmp_path, commands):
+    filename = write_flac(tmp_path / '01.flac', CANONICAL, id3=True)
+    session = SanitizeSession(genres={})
+    result = session.process_file(filename)
+    assert result.skipped
+    assert not result.changed
+    assert len(commands) == 1 and commands[0].startswith('id3v2')
+    assert session.counters['rewrites_avoided'] == 1